@@ -0,0 +1,179 @@
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import degrees
+
+# Number of people generated when none is given. With the movies per
+# person and cast sizes below this writes about two million star edges,
+# on the scale of the full IMDb data
+PEOPLE = 1000000
+
+# Movies generated per person
+MOVIES_PER_PERSON = 0.6
+
+# Shape of the Pareto distribution of cast sizes, and the largest cast
+CAST_SHAPE = 1.5
+MAX_CAST = 200
+
+# Fraction of people generated without any movies
+UNCREDITED = 0.01
+
+# Number of queries timed in each query scenario
+QUERIES = 20
+
+
+def main():
+    if len(sys.argv) > 3:
+        sys.exit("Usage: python benchmark.py [people] [seed]")
+    people_count = int(sys.argv[1]) if len(sys.argv) >= 2 else PEOPLE
+    seed = int(sys.argv[2]) if len(sys.argv) == 3 else 0
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        edges = generate(directory, people_count, seed)
+        results = {
+            "people": people_count,
+            "seed": seed,
+            "edges": edges,
+            "generate_seconds": time.perf_counter() - start,
+            "scenarios": run_scenarios(directory, seed),
+        }
+    print(json.dumps(results, indent=2))
+
+
+def generate(directory, people_count, seed):
+    """
+    Write people.csv, movies.csv and stars.csv for a random co-star
+    graph to `directory`, in the same layout as the real datasets.
+
+    Cast sizes follow a Pareto distribution and people are cast with
+    Zipf-like popularity, so a few people star in many movies.
+    Returns the number of star edges written.
+    """
+    rng = random.Random(seed)
+    movie_count = max(1, int(people_count * MOVIES_PER_PERSON))
+    credited = people_count - int(people_count * UNCREDITED)
+
+    with open(os.path.join(directory, "people.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "birth"])
+        for person in range(people_count):
+            writer.writerow([person, f"Person {person}", rng.randint(1900, 2010)])
+
+    with open(os.path.join(directory, "movies.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "title", "year"])
+        for movie in range(movie_count):
+            writer.writerow([movie, f"Movie {movie}", rng.randint(1920, 2020)])
+
+    # Shuffle popularity so ids say nothing about degree
+    popularity = list(range(credited))
+    rng.shuffle(popularity)
+    weights = [1 / (rank + 1) ** 0.8 for rank in range(credited)]
+    cumulative = []
+    total = 0
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+
+    edges = 0
+    with open(os.path.join(directory, "stars.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "movie_id"])
+        for movie in range(movie_count):
+            cast_size = min(MAX_CAST, int(rng.paretovariate(CAST_SHAPE)) + 1)
+            cast = set(rng.choices(popularity, cum_weights=cumulative, k=cast_size))
+            writer.writerows((person, movie) for person in cast)
+            edges += len(cast)
+    return edges
+
+
+def run_scenarios(directory, seed):
+    """
+    Time loading and querying the dataset in `directory`,
+    returning a dictionary of results per scenario.
+    """
+    rng = random.Random(seed)
+    results = {}
+
+    # The first load writes the snapshot that the second one reads
+    results["load_cold"] = timed(degrees.load_data, directory)
+    results["load_snapshot"] = timed(degrees.load_data, directory)
+
+    # Query from the person in the most movies to targets chosen
+    # by their distance from that person, and between random
+    # people connected to them
+    person_ids = degrees.graph["person_ids"]
+    uncredited = [person_ids[person] for person in range(len(person_ids)) if not degrees.movies_of(person)]
+    source = max(range(len(person_ids)), key=lambda person: len(degrees.movies_of(person)))
+    distances = degrees.bfs_distances(source)
+    reachable = [person for person in range(len(person_ids)) if distances[person] != degrees.FAR]
+    near = [person_ids[person] for person in reachable if 0 < distances[person] <= 2]
+    far = sorted(reachable, key=lambda person: distances[person])[-QUERIES:]
+
+    def pairs(targets):
+        if not targets:
+            return []
+        return [(person_ids[source], rng.choice(targets)) for _ in range(QUERIES)]
+
+    scenarios = {
+        "near": pairs(near),
+        "far": pairs([person_ids[person] for person in far]),
+        "unreachable": pairs(uncredited),
+        "random": [
+            (person_ids[rng.choice(reachable)], person_ids[rng.choice(reachable)])
+            for _ in range(QUERIES)
+        ],
+    }
+
+    # Measure the landmarks up front so the first A* query does not pay for them
+    results["landmarks"] = timed(degrees.landmark_distances)
+    for name, queries in scenarios.items():
+        results[f"query_{name}"] = time_queries(degrees.shortest_path, queries)
+        results[f"astar_{name}"] = time_queries(degrees.astar_path, queries)
+
+    os.remove(degrees.snapshot_path(directory))
+    tracemalloc.start()
+    degrees.load_data(directory)
+    results["load_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    # The snapshot and column file live outside the temporary directory
+    os.remove(degrees.snapshot_path(directory))
+    os.remove(degrees.columns_path(directory))
+    return results
+
+
+def timed(function, *args):
+    """
+    Returns the seconds taken to call `function` with `args`.
+    """
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def time_queries(search, queries):
+    """
+    Returns timing statistics for running `search` on each
+    (source, target) pair in `queries`.
+    """
+    if not queries:
+        return None
+    times = sorted(timed(search, source, target) for source, target in queries)
+    return {
+        "queries": len(times),
+        "mean_seconds": sum(times) / len(times),
+        "median_seconds": times[len(times) // 2],
+        "max_seconds": times[-1],
+    }
+
+
+if __name__ == "__main__":
+    main()
@@ -1,55 +1,814 @@
 import csv
+import heapq
+import io
+import mmap
+import multiprocessing
+import os
+import pickle
 import sys
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter, OrderedDict
+from itertools import accumulate
+from concurrent.futures import ProcessPoolExecutor
 
-from util import Node, StackFrontier, QueueFrontier
+from util import Node, StackFrontier, QueueFrontier, PriorityFrontier
 
-# Maps names to a set of corresponding person_ids
-names = {}
+# Bump whenever the layout of the snapshot written by load_data changes
+SNAPSHOT_VERSION = 11
 
-# Maps person_ids to a dictionary of: name, birth, movies (a set of movie_ids)
+CSV_FILES = ("people.csv", "movies.csv", "stars.csv")
+
+# Number of high-degree people whose distances to everyone are
+# measured, on the first search that needs them
+LANDMARKS = 16
+
+# Number of landmarks whose distances guide each A* search
+ACTIVE_LANDMARKS = 4
+
+# Arrays of graph written to the snapshot as raw machine values
+SNAPSHOT_ARRAYS = (
+    "person_offsets", "person_movies", "movie_offsets", "movie_stars",
+    "components", "component_parents", "component_sizes",
+)
+
+# Landmark distance standing for "unreachable or too far to store"
+FAR = 255
+
+# stars.csv files at least this large are parsed in parallel chunks
+PARALLEL_STARS_BYTES = 32 * 1024 * 1024
+
+# Maximum number of single-source BFS trees kept in memory
+TREE_CACHE_SIZE = 8
+
+# Trigrams shared by more than this fraction of people (and by more
+# than FUZZY_CANDIDATES) are too common to pick out fuzzy name
+# matches, so searches skip them
+COMMON_TRIGRAM = 0.05
+
+# Number of fuzzy name candidates scored exactly per search
+FUZZY_CANDIDATES = 100
+
+# Lookup structures over the names of people: order is an array of
+# person indexes sorted by lowercase name and person_id for exact and
+# prefix search, and trigrams maps each trigram to an array of the
+# indexes of the people whose names contain it for fuzzy search,
+# or is None until the first fuzzy search builds it
+name_index = {}
+
+# Maps person_ids to their index in graph. Names and births
+# are read through person_info, and movies through movies_of
 people = {}
 
-# Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
+# Maps movie_ids to their index in graph. Titles and years
+# are read through movie_info, and stars through stars_of
 movies = {}
 
+# Column file holding the display fields of people and movies:
+# path and size of the file, and for each field an array of offsets
+# where the value for graph index i spans offsets[i] to offsets[i + 1].
+# data holds the file once it has been memory-mapped, or the fields
+# themselves if the file could not be written (path is then None).
+# extra holds a list of values per field for people and movies added
+# after the file was written
+columns = {}
+
+# Integer-indexed co-star graph over people and movies:
+# person_ids and movie_ids map dense indexes back to IMDB ids, and the
+# person_movies / movie_stars arrays hold each index's adjacency
+# between person_offsets[i] and person_offsets[i + 1] (likewise for movies).
+# extra_movies and extra_stars hold adjacency added after the arrays were
+# built, as lists keyed by person and movie index.
+# components labels each person index with a component label, merged
+# labels are linked by component_parents, and component_sizes holds the
+# number of people under each root label.
+# After a snapshot load these arrays are memoryviews over the mapped
+# file, until thaw_arrays copies them.
+# landmarks lists the landmark person indexes, and landmark_distances
+# holds one array of distances (capped at FAR) from each landmark
+graph = {}
+
+# Maps person indexes to their cached BFS tree, least recently used first
+trees = OrderedDict()
+
 
 def load_data(directory):
     """
     Load data from CSV files into memory.
+
+    Reuses the binary snapshot next to `directory` if it was written
+    from the same CSV files, and writes a fresh one otherwise.
+    Any previously loaded data is forgotten first.
+    """
+    for structure in (name_index, people, movies, columns, graph, trees):
+        structure.clear()
+    key = snapshot_key(directory)
+    if load_snapshot(directory, key):
+        return
+
+    # Load people and movies, keeping the last row for a repeated id
+    values = {}
+    person_ids = load_records(f"{directory}/people.csv", people, ("name", "birth"), values)
+    movie_ids = load_records(f"{directory}/movies.csv", movies, ("title", "year"), values)
+
+    # Load stars, skipping credits for unknown people or movies
+    build_graph(person_ids, movie_ids, load_stars(f"{directory}/stars.csv"))
+    index_names(values["name"])
+    store_columns(directory, values)
+    save_snapshot(directory, key)
+
+
+def load_records(filename, index, fields, values):
     """
-    # Load people
-    with open(f"{directory}/people.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            people[row["id"]] = {
-                "name": row["name"],
-                "birth": row["birth"],
-                "movies": set()
-            }
-            if row["name"].lower() not in names:
-                names[row["name"].lower()] = {row["id"]}
+    Read the rows of a people.csv or movies.csv file, numbering each
+    new id in `index` and adding its `fields` to lists in `values`.
+
+    Returns the list of ids in index order.
+    """
+    ids = []
+    for field in fields:
+        values[field] = []
+    with open(filename, encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            i = index.setdefault(row["id"], len(ids))
+            if i == len(ids):
+                ids.append(row["id"])
+                for field in fields:
+                    values[field].append(row[field])
             else:
-                names[row["name"].lower()].add(row["id"])
-
-    # Load movies
-    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            movies[row["id"]] = {
-                "title": row["title"],
-                "year": row["year"],
-                "stars": set()
-            }
-
-    # Load stars
-    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            try:
-                people[row["person_id"]]["movies"].add(row["movie_id"])
-                movies[row["movie_id"]]["stars"].add(row["person_id"])
-            except KeyError:
-                pass
+                for field in fields:
+                    values[field][i] = row[field]
+    return ids
+
+
+def load_stars(filename):
+    """
+    Returns an array of person * len(movies) + movie keys for the
+    credits in a stars.csv file, skipping unknown people or movies.
+
+    Large files are split into byte ranges that are parsed in a pool
+    of forked processes, one chunk per CPU. The workers share `people`
+    and `movies` with this process and send back only their arrays.
+    """
+    with open(filename, encoding="utf-8") as f:
+        header = next(csv.reader([f.readline()]))
+    fields = (header.index("person_id"), header.index("movie_id"))
+
+    size = os.path.getsize(filename)
+    workers = os.cpu_count() or 1
+    if size < PARALLEL_STARS_BYTES or workers == 1 or "fork" not in multiprocessing.get_all_start_methods():
+        return read_stars_chunk(filename, 0, size, fields)
+
+    bounds = [size * i // workers for i in range(workers + 1)]
+    credits = array("q")
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("fork")) as executor:
+        chunks = executor.map(
+            read_stars_chunk,
+            [filename] * workers, bounds[:-1], bounds[1:], [fields] * workers
+        )
+        for chunk in chunks:
+            credits.extend(chunk)
+    return credits
+
+
+def read_stars_chunk(filename, start, end, fields):
+    """
+    Returns an array of person * len(movies) + movie keys for the
+    credits on the lines of a stars.csv file that start within the
+    byte range [start, end), skipping the header and unknown ids.
+
+    Assumes no field contains a newline, which holds for the id columns.
+    """
+    with open(filename, "rb") as f:
+        if start == 0:
+            f.readline()
+        else:
+            # Skip the rest of a line begun in the previous chunk
+            f.seek(start - 1)
+            f.readline()
+        position = f.tell()
+        data = f.read(max(end - position, 0))
+        if data and not data.endswith(b"\n"):
+            data += f.readline()
+
+    person_column, movie_column = fields
+    movie_count = len(movies)
+    credits = array("q")
+    for row in csv.reader(io.StringIO(data.decode("utf-8"))):
+        if not row:
+            continue
+        person = people.get(row[person_column])
+        movie = movies.get(row[movie_column])
+        if person is not None and movie is not None:
+            credits.append(person * movie_count + movie)
+    return credits
+
+
+def snapshot_path(directory):
+    """
+    Returns the path of the snapshot file for a data directory.
+    """
+    return os.path.normpath(directory) + ".snapshot"
+
+
+def snapshot_key(directory):
+    """
+    Returns a value identifying the current contents of the CSV files,
+    based on their sizes and modification times.
+    """
+    key = [SNAPSHOT_VERSION]
+    for filename in CSV_FILES:
+        stat = os.stat(os.path.join(directory, filename))
+        key.append((filename, stat.st_size, stat.st_mtime_ns))
+    return key
+
+
+def load_snapshot(directory, key):
+    """
+    Loads `name_index`, `people`, `movies`, `graph` and `columns`
+    from the snapshot for `directory` if it matches `key`.
+
+    The arrays are memory-mapped rather than read, so only the pages
+    that searches touch are loaded. Returns True if the snapshot was used.
+    """
+    try:
+        with open(snapshot_path(directory), "rb") as f:
+            if pickle.load(f) != key:
+                return False
+            manifest = pickle.load(f)
+            # Copy-on-write, so path compression can update component labels
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    except (OSError, ValueError, pickle.UnpicklingError, EOFError):
+        return False
+    start = len(data) - manifest["size"]
+    if start < 0:
+        return False
+
+    # The column file must be the one written alongside the snapshot
+    path = columns_path(directory)
+    try:
+        if os.path.getsize(path) != manifest["columns_size"]:
+            return False
+    except OSError:
+        return False
+
+    view = memoryview(data)
+    sections = {"ids": {}, "name_index": {}, "graph": {}, "columns": {}}
+    for structure, field, typecode, offset, size in manifest["sections"]:
+        section = view[start + offset:start + offset + size]
+        if typecode is None:
+            # Each id is followed by a newline
+            sections[structure][field] = str(section, "utf-8").split("\n")[:-1]
+        else:
+            sections[structure][field] = section.cast(typecode)
+
+    person_ids = sections["ids"]["person_ids"]
+    movie_ids = sections["ids"]["movie_ids"]
+    people.update(zip(person_ids, range(len(person_ids))))
+    movies.update(zip(movie_ids, range(len(movie_ids))))
+    name_index.clear()
+    name_index.update(sections["name_index"], trigrams=None)
+    graph.clear()
+    graph.update(
+        sections["graph"],
+        person_ids=person_ids,
+        movie_ids=movie_ids,
+        extra_movies={},
+        extra_stars={},
+        landmarks=None,
+        landmark_distances=None,
+    )
+    columns.clear()
+    columns.update(
+        path=path,
+        size=manifest["columns_size"],
+        offsets=sections["columns"],
+        extra={field: [] for field in sections["columns"]},
+    )
+    return True
+
+
+def save_snapshot(directory, key):
+    """
+    Writes the loaded data to the snapshot for `directory`.
+
+    The file holds the pickled key, then a pickled manifest of
+    sections, then each array's machine values and each list of ids
+    as a raw section aligned to 8 bytes, ending at the end of the
+    file. The key is written first so stale snapshots are rejected
+    without reading the rest.
+
+    Nothing is written if the column file could not be.
+    """
+    if columns["path"] is None:
+        return
+    sections = [
+        ("ids", "person_ids", "".join(f"{person_id}\n" for person_id in graph["person_ids"]).encode("utf-8")),
+        ("ids", "movie_ids", "".join(f"{movie_id}\n" for movie_id in graph["movie_ids"]).encode("utf-8")),
+        ("name_index", "order", name_index["order"]),
+    ]
+    sections.extend(("graph", field, graph[field]) for field in SNAPSHOT_ARRAYS)
+    sections.extend(("columns", field, offsets) for field, offsets in columns["offsets"].items())
+
+    manifest = {
+        "columns_size": columns["size"],
+        "sections": [],
+    }
+    position = 0
+    for structure, field, values in sections:
+        if isinstance(values, array):
+            typecode, size = values.typecode, len(values) * values.itemsize
+        else:
+            typecode, size = None, len(values)
+        manifest["sections"].append((structure, field, typecode, position, size))
+        position += size + -size % 8
+    manifest["size"] = position
+
+    path = snapshot_path(directory)
+    try:
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(key, f, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(manifest, f, pickle.HIGHEST_PROTOCOL)
+            f.write(bytes(-f.tell() % 8))
+            for _, _, values in sections:
+                if isinstance(values, array):
+                    values.tofile(f)
+                else:
+                    f.write(values)
+                f.write(bytes(-f.tell() % 8))
+        os.replace(path + ".tmp", path)
+    except OSError:
+        pass
+
+
+def thaw_arrays():
+    """
+    Copy any arrays memory-mapped from a snapshot into arrays
+    of their own, so they can grow as data is added.
+    """
+    for structure in (graph, name_index):
+        for field, value in structure.items():
+            if isinstance(value, memoryview):
+                structure[field] = array(value.format, value.tobytes())
+
+
+def columns_path(directory):
+    """
+    Returns the path of the column file for a data directory.
+    """
+    return os.path.normpath(directory) + ".columns"
+
+
+def store_columns(directory, values):
+    """
+    Write the display fields of every person and movie, given as lists
+    in graph index order in `values`, to the column file for `directory`.
+
+    If the file cannot be written the fields stay in memory.
+    """
+    path = columns_path(directory)
+    data = bytearray()
+    offsets = {}
+    for field, field_values in values.items():
+        # Fields follow one another in the file
+        offsets[field] = array("q", [len(data)]) * (len(field_values) + 1)
+        for i, value in enumerate(field_values):
+            data += value.encode("utf-8")
+            offsets[field][i + 1] = len(data)
+
+    columns.clear()
+    columns.update(path=None, size=len(data), offsets=offsets, extra={field: [] for field in values})
+    try:
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+    except OSError:
+        columns["data"] = bytes(data)
+        return
+    columns["path"] = path
+
+
+def read_column(field, index):
+    """
+    Returns the value of `field` for graph index `index`
+    from the column file, mapping the file on first use.
+    """
+    offsets = columns["offsets"][field]
+    if index >= len(offsets) - 1:
+        return columns["extra"][field][index - len(offsets) + 1]
+    if "data" not in columns:
+        if columns["size"] == 0:
+            columns["data"] = b""
+        else:
+            with open(columns["path"], "rb") as f:
+                columns["data"] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return columns["data"][offsets[index]:offsets[index + 1]].decode("utf-8")
+
+
+def person_info(person_id, field):
+    """
+    Returns the name or birth of a person_id.
+    """
+    return read_column(field, people[person_id])
+
+
+def movie_info(movie_id, field):
+    """
+    Returns the title or year of a movie_id.
+    """
+    return read_column(field, movies[movie_id])
+
+
+def name_key(person):
+    """
+    Returns the lowercase name of a person index,
+    which orders the name index ahead of the person_id.
+    """
+    return read_column("name", person).lower()
+
+
+def index_names(person_names):
+    """
+    Build the name order over a list of every person's name in graph
+    index order. The trigram index is left for `index_trigrams` to
+    build when first needed.
+    """
+    person_ids = graph["person_ids"]
+    lowered = [name.lower() for name in person_names]
+    order = array("i", sorted(range(len(lowered)), key=lambda person: (lowered[person], person_ids[person])))
+    name_index.clear()
+    name_index.update(order=order, trigrams=None)
+
+
+def index_trigrams():
+    """
+    Build the trigram index over the name of every person.
+    """
+    trigrams = {}
+    name = None
+    for person in name_index["order"]:
+        # People sharing a name are adjacent in the order
+        if name_key(person) != name:
+            name = name_key(person)
+            name_trigram_set = name_trigrams(name)
+        for trigram in name_trigram_set:
+            postings = trigrams.get(trigram)
+            if postings is None:
+                postings = trigrams[trigram] = array("i")
+            postings.append(person)
+    name_index["trigrams"] = trigrams
+
+
+def people_named(name):
+    """
+    Returns the sorted person_ids of everyone whose name
+    matches `name`, ignoring case.
+    """
+    name = name.lower()
+    order = name_index["order"]
+    person_ids = []
+    i = bisect_left(order, name, key=name_key)
+    while i < len(order) and name_key(order[i]) == name:
+        person_ids.append(graph["person_ids"][order[i]])
+        i += 1
+    return person_ids
+
+
+def name_trigrams(name):
+    """
+    Returns the set of three-character substrings of a lowercase name,
+    padded so the start and end of the name count as well.
+    """
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def search_names(query, k=10):
+    """
+    Returns up to `k` person_ids whose names best match `query`.
+
+    Names starting with the query come first, in alphabetical order,
+    followed by names sharing the most trigrams with the query.
+    """
+    query = query.lower()
+    matches = []
+
+    # Prefix matches are contiguous in the name order
+    order = name_index["order"]
+    i = bisect_left(order, query, key=name_key)
+    while i < len(order) and len(matches) < k and name_key(order[i]).startswith(query):
+        matches.append(order[i])
+        i += 1
+    person_ids = [graph["person_ids"][person] for person in matches]
+
+    if len(person_ids) < k:
+        person_ids.extend(fuzzy_matches(query, k - len(person_ids), set(matches)))
+    return person_ids
+
+
+def fuzzy_matches(query, k, skip):
+    """
+    Returns up to `k` person_ids whose names share the most trigrams
+    with a lowercase query, leaving out the person indexes in `skip`.
+
+    Candidates come from the query's rarest trigrams: a name sharing at
+    least half of them with the query contains one of the rarest half.
+    The most frequent candidates are then scored by exact similarity.
+    """
+    if name_index["trigrams"] is None:
+        index_trigrams()
+    query_trigrams = name_trigrams(query)
+    postings = sorted(
+        (name_index["trigrams"].get(trigram, ()) for trigram in query_trigrams),
+        key=len
+    )
+    common = max(COMMON_TRIGRAM * len(graph["person_ids"]), FUZZY_CANDIDATES)
+
+    shared = Counter()
+    for i, people_with_trigram in enumerate(postings):
+        if len(people_with_trigram) > common or (i >= (len(postings) + 1) // 2 and len(shared) >= k):
+            break
+        shared.update(people_with_trigram)
+    for person in skip:
+        shared.pop(person, None)
+
+    # Score by the Jaccard similarity of the trigram sets
+    scores = []
+    for person, _ in shared.most_common(FUZZY_CANDIDATES):
+        person_id = graph["person_ids"][person]
+        name = person_info(person_id, "name").lower()
+        trigrams = name_trigrams(name)
+        count = len(trigrams & query_trigrams)
+        scores.append((-count / (len(query_trigrams) + len(trigrams) - count), name, person_id))
+    return [person_id for _, _, person_id in heapq.nsmallest(k, scores)]
+
+
+def build_graph(person_ids, movie_ids, credits):
+    """
+    Build the integer-indexed co-star graph over `people` and `movies`
+    from an array of person * len(movie_ids) + movie credit keys,
+    which may repeat.
+    """
+    # Sorted keys group each person's movies, so repeats are adjacent
+    person_offsets = array("i", [0]) * (len(person_ids) + 1)
+    person_movies = array("i")
+    movie_offsets = array("i", [0]) * (len(movie_ids) + 1)
+    previous = -1
+    for credit in sorted(credits):
+        if credit == previous:
+            continue
+        previous = credit
+        person, movie = divmod(credit, len(movie_ids))
+        person_movies.append(movie)
+        person_offsets[person + 1] += 1
+        movie_offsets[movie + 1] += 1
+    person_offsets = array("i", accumulate(person_offsets))
+    movie_offsets = array("i", accumulate(movie_offsets))
+
+    # Place each person in the next free slot of their movies
+    movie_stars = array("i", [0]) * len(person_movies)
+    slots = movie_offsets[:-1]
+    for person in range(len(person_ids)):
+        for movie in person_movies[person_offsets[person]:person_offsets[person + 1]]:
+            movie_stars[slots[movie]] = person
+            slots[movie] += 1
+
+    graph.clear()
+    graph.update(
+        person_ids=person_ids,
+        movie_ids=movie_ids,
+        person_offsets=person_offsets,
+        person_movies=person_movies,
+        movie_offsets=movie_offsets,
+        movie_stars=movie_stars,
+        extra_movies={},
+        extra_stars={},
+    )
+    graph["landmarks"] = None
+    graph["landmark_distances"] = None
+    label_components()
+
+
+def label_components():
+    """
+    Label every person in `graph` with a connected component
+    by union-find over the stars of each movie.
+    """
+    parents = array("i", range(len(graph["person_ids"])))
+
+    def find(person):
+        while parents[person] != person:
+            parents[person] = parents[parents[person]]
+            person = parents[person]
+        return person
+
+    movie_offsets = graph["movie_offsets"]
+    movie_stars = graph["movie_stars"]
+    for movie in range(len(graph["movie_ids"])):
+        start, end = movie_offsets[movie], movie_offsets[movie + 1]
+        if end - start < 2:
+            continue
+        root = find(movie_stars[start])
+        for star in movie_stars[start + 1:end]:
+            other = find(star)
+            if other != root:
+                parents[other] = root
+
+    # Relabel roots as dense component ids
+    labels = {}
+    components = array("i", [0]) * len(parents)
+    component_sizes = array("i")
+    for person in range(len(parents)):
+        root = find(person)
+        if root not in labels:
+            labels[root] = len(component_sizes)
+            component_sizes.append(0)
+        components[person] = labels[root]
+        component_sizes[labels[root]] += 1
+
+    graph["components"] = components
+    graph["component_parents"] = array("i", range(len(component_sizes)))
+    graph["component_sizes"] = component_sizes
+
+
+def component_of(person):
+    """
+    Returns the root component label of a person index.
+    """
+    parents = graph["component_parents"]
+    label = graph["components"][person]
+    while parents[label] != label:
+        parents[label] = parents[parents[label]]
+        label = parents[label]
+    return label
+
+
+def connected(source, target):
+    """
+    Returns True if some path connects the two person_ids.
+    """
+    return component_of(people[source]) == component_of(people[target])
+
+
+def component_size(person_id):
+    """
+    Returns the number of people connected to a person_id,
+    including that person.
+    """
+    return graph["component_sizes"][component_of(people[person_id])]
+
+
+def movies_of(person):
+    """
+    Returns an array (or memoryview, before thaw_arrays)
+    of the movie indexes of a person index.
+    """
+    person_offsets = graph["person_offsets"]
+    movies = graph["person_movies"][person_offsets[person]:person_offsets[person + 1]]
+    if person in graph["extra_movies"]:
+        movies.extend(graph["extra_movies"][person])
+    return movies
+
+
+def stars_of(movie):
+    """
+    Returns an array (or memoryview, before thaw_arrays)
+    of the person indexes starring in a movie index.
+    """
+    movie_offsets = graph["movie_offsets"]
+    stars = graph["movie_stars"][movie_offsets[movie]:movie_offsets[movie + 1]]
+    if movie in graph["extra_stars"]:
+        stars.extend(graph["extra_stars"][movie])
+    return stars
+
+
+def load_delta(directory):
+    """
+    Add the people, movies and stars in whichever of people.csv,
+    movies.csv and stars.csv exist in `directory` to the loaded data.
+    """
+    if os.path.exists(f"{directory}/people.csv"):
+        with open(f"{directory}/people.csv", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                add_person(row["id"], row["name"], row["birth"])
+
+    if os.path.exists(f"{directory}/movies.csv"):
+        with open(f"{directory}/movies.csv", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                add_movie(row["id"], row["title"], row["year"])
+
+    if os.path.exists(f"{directory}/stars.csv"):
+        with open(f"{directory}/stars.csv", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                if row["person_id"] in people and row["movie_id"] in movies:
+                    add_star(row["person_id"], row["movie_id"])
+
+
+def add_person(person_id, name, birth):
+    """
+    Add a person to the loaded data, keeping the name index
+    and graph up to date. Known person_ids are left unchanged.
+    Cached BFS trees stay valid, as the new person has no movies.
+    """
+    if person_id in people:
+        return
+    thaw_arrays()
+    person = people[person_id] = len(graph["person_ids"])
+    graph["person_ids"].append(person_id)
+    columns["extra"]["name"].append(name)
+    columns["extra"]["birth"].append(birth)
+
+    person_ids = graph["person_ids"]
+    insort(name_index["order"], person, key=lambda other: (name_key(other), person_ids[other]))
+    if name_index["trigrams"] is not None:
+        for trigram in name_trigrams(name.lower()):
+            name_index["trigrams"].setdefault(trigram, array("i")).append(person)
+
+    # A new person has no movies, so is alone in a new component
+    graph["person_offsets"].append(graph["person_offsets"][-1])
+    graph["components"].append(len(graph["component_parents"]))
+    graph["component_parents"].append(len(graph["component_parents"]))
+    graph["component_sizes"].append(1)
+    # Landmarks measured later take the new person into account
+    if graph["landmark_distances"] is not None:
+        for distances in graph["landmark_distances"]:
+            distances.append(FAR)
+
+
+def add_movie(movie_id, title, year):
+    """
+    Add a movie to the loaded data. Known movie_ids are left unchanged.
+    """
+    if movie_id in movies:
+        return
+    thaw_arrays()
+    movies[movie_id] = len(graph["movie_ids"])
+    graph["movie_ids"].append(movie_id)
+    columns["extra"]["title"].append(title)
+    columns["extra"]["year"].append(year)
+    graph["movie_offsets"].append(graph["movie_offsets"][-1])
+
+
+def add_star(person_id, movie_id):
+    """
+    Record that a known person starred in a known movie, keeping
+    the components and landmark distances up to date and dropping
+    cached BFS trees.
+    """
+    person = people[person_id]
+    movie = movies[movie_id]
+    if movie in movies_of(person):
+        return
+    thaw_arrays()
+
+    co_stars = stars_of(movie)
+    graph["extra_movies"].setdefault(person, []).append(movie)
+    graph["extra_stars"].setdefault(movie, []).append(person)
+
+    # The movie's existing stars already share a component
+    if co_stars:
+        merge_components(person, co_stars[0])
+    if graph["landmark_distances"] is not None:
+        for distances in graph["landmark_distances"]:
+            shorten_distances(distances, movie)
+    trees.clear()
+
+
+def merge_components(person, other):
+    """
+    Merge the components of two person indexes.
+    """
+    root, other_root = component_of(person), component_of(other)
+    if root == other_root:
+        return
+    sizes = graph["component_sizes"]
+    if sizes[root] < sizes[other_root]:
+        root, other_root = other_root, root
+    graph["component_parents"][other_root] = root
+    sizes[root] += sizes[other_root]
+
+
+def shorten_distances(distances, movie):
+    """
+    Update an array of BFS distances after a star is added to `movie`,
+    lowering the distance of anyone now reachable by a shorter path.
+    """
+    stars = stars_of(movie)
+    nearest = min(distances[star] for star in stars) + 1
+    level = [star for star in stars if distances[star] > nearest]
+    for star in level:
+        distances[star] = nearest
+
+    while level and nearest + 1 < FAR:
+        nearest += 1
+        next_level = []
+        for person in level:
+            for movie in movies_of(person):
+                for star in stars_of(movie):
+                    if distances[star] > nearest:
+                        distances[star] = nearest
+                        next_level.append(star)
+        level = next_level
 
 
 def main():
@@ -78,56 +837,477 @@ def main():
         print(f"{degrees} degrees of separation.")
         path = [(None, source)] + path
         for i in range(degrees):
-            person1 = people[path[i][1]]["name"]
-            person2 = people[path[i + 1][1]]["name"]
-            movie = movies[path[i + 1][0]]["title"]
+            person1 = person_info(path[i][1], "name")
+            person2 = person_info(path[i + 1][1], "name")
+            movie = movie_info(path[i + 1][0], "title")
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
-def shortest_path(source, target):
+def measure_landmarks():
+    """
+    Store BFS distances from the LANDMARKS people
+    starring in the most movies.
+    """
+    person_offsets = graph["person_offsets"]
+    people_by_degree = sorted(
+        range(len(graph["person_ids"])),
+        key=lambda person: person_offsets[person + 1] - person_offsets[person],
+        reverse=True
+    )
+    graph["landmarks"] = people_by_degree[:LANDMARKS]
+    graph["landmark_distances"] = [
+        bfs_distances(landmark) for landmark in graph["landmarks"]
+    ]
+
+
+def sweep(source):
+    """
+    Runs a full BFS from person index `source` one level at a time,
+    alternating between the people and movies of the bipartite graph.
+
+    Returns (distances, parents, parent_movies) arrays over every
+    person, holding -1 for people that cannot be reached.
+    """
+    distances = array("i", [-1]) * len(graph["person_ids"])
+    parents = array("i", [-1]) * len(graph["person_ids"])
+    parent_movies = array("i", [-1]) * len(graph["person_ids"])
+    movie_parents = array("i", [-1]) * len(graph["movie_ids"])
+    distances[source] = 0
+    parents[source] = source
+
+    level = [source]
+    distance = 0
+    while level:
+        distance += 1
+
+        # Every movie is reached from the first person to reach it
+        level_movies = []
+        for person in level:
+            for movie in movies_of(person):
+                if movie_parents[movie] == -1:
+                    movie_parents[movie] = person
+                    level_movies.append(movie)
+
+        level = []
+        for movie in level_movies:
+            for star in stars_of(movie):
+                if distances[star] == -1:
+                    distances[star] = distance
+                    parents[star] = movie_parents[movie]
+                    parent_movies[star] = movie
+                    level.append(star)
+
+    return distances, parents, parent_movies
+
+
+def degree_distribution(person_id):
+    """
+    Returns a list whose i-th entry is the number of people
+    exactly i degrees of separation from a person_id.
+    """
+    counts = []
+    for distance in sweep(people[person_id])[0]:
+        if distance == -1:
+            continue
+        if distance >= len(counts):
+            counts.extend([0] * (distance + 1 - len(counts)))
+        counts[distance] += 1
+    return counts
+
+
+def bfs_distances(source):
+    """
+    Returns an array of the distance from person index `source`
+    to every person, with FAR for people further away or unreachable.
+    """
+    return array("B", (
+        distance if 0 <= distance < FAR else FAR
+        for distance in sweep(source)[0]
+    ))
+
+
+def degree_bounds(source, target):
+    """
+    Returns a (lower, upper) bound on the degrees of separation
+    between two person_ids using only the landmark distances.
+
+    upper is None if no landmark links the two people, and the
+    result is None if they are not connected at all.
+    """
+    if source == target:
+        return (0, 0)
+    if not connected(source, target):
+        return None
+    return landmark_bounds(people[source], people[target])
+
+
+def landmark_bounds(source, target):
+    """
+    Returns a (lower, upper) bound on the distance between
+    two connected person indexes through the landmarks.
+    """
+    lower, upper = 1, None
+    for distances in landmark_distances():
+        to_source, to_target = distances[source], distances[target]
+        if to_source == FAR or to_target == FAR:
+            continue
+        lower = max(lower, abs(to_source - to_target))
+        if upper is None or to_source + to_target < upper:
+            upper = to_source + to_target
+    return (lower, upper)
+
+
+def landmark_heuristic(person, target):
+    """
+    Returns a lower bound on the distance between two person indexes,
+    by the triangle inequality through each landmark.
+    """
+    estimate = 0
+    for distances in landmark_distances():
+        to_person, to_target = distances[person], distances[target]
+        if to_person != FAR and to_target != FAR:
+            estimate = max(estimate, abs(to_person - to_target))
+    return estimate
+
+
+def landmark_distances():
+    """
+    Returns the list of landmark distance arrays,
+    measuring them the first time they are needed.
+    """
+    if graph["landmark_distances"] is None:
+        measure_landmarks()
+    return graph["landmark_distances"]
+
+
+def active_landmarks(source, target):
+    """
+    Returns (distances, distance to target) pairs for the
+    ACTIVE_LANDMARKS landmarks giving the best lower bound on
+    the distance between two person indexes.
+    """
+    active = [
+        (abs(distances[source] - distances[target]), i, distances)
+        for i, distances in enumerate(landmark_distances())
+        if distances[source] != FAR and distances[target] != FAR
+    ]
+    return [
+        (distances, distances[target])
+        for _, _, distances in heapq.nlargest(ACTIVE_LANDMARKS, active)
+    ]
+
+
+def landmark_path(source, target):
+    """
+    Returns the shortest path between two person indexes that passes
+    through a landmark, as a pair of forward and backward nodes meeting
+    at the landmark, or None if no landmark reaches both.
+    """
+    best = None
+    for distances in landmark_distances():
+        if distances[source] == FAR or distances[target] == FAR:
+            continue
+        if best is None or distances[source] + distances[target] < best[source] + best[target]:
+            best = distances
+    if best is None:
+        return None
+
+    # Walk down the distances from each end to the landmark
+    nodes = []
+    for person in (source, target):
+        node = Node(person, None, None)
+        while best[node.state] > 0:
+            node = next(
+                Node(star, node, movie)
+                for movie in movies_of(node.state)
+                for star in stars_of(movie)
+                if best[star] == best[node.state] - 1
+            )
+        nodes.append(node)
+    return nodes
+
+
+def astar_path(source, target):
     """
     Returns the shortest list of (movie_id, person_id) pairs
-    that connect the source to the target.
+    that connect the source to the target, found by A* search
+    guided by the landmark distances.
+
+    The shortest path through a landmark is the best path until the
+    search finds a shorter one, so the search only expands people who
+    could lie on a shorter path, and stops once none are left.
 
     If no possible path, returns None.
     """
-    frontier = QueueFrontier()
-    frontier.add(Node(source, None, None))
+    if source == target:
+        return []
+    if not connected(source, target):
+        return None
+    source = people[source]
+    target = people[target]
+
+    best = landmark_path(source, target)
+    if best is None:
+        best_cost = len(graph["person_ids"])
+    else:
+        best_cost = len(join_paths(*best))
+    landmarks = active_landmarks(source, target)
+
+    def estimate(person):
+        # Everyone but the target's co-stars is at least two steps away
+        bound = 2
+        for distances, to_target in landmarks:
+            to_person = distances[person]
+            if to_person != FAR and abs(to_person - to_target) > bound:
+                bound = abs(to_person - to_target)
+        return bound
+
+    target_movies = set(movies_of(target))
+    co_stars = {star for movie in target_movies for star in stars_of(movie)}
+
+    # Ties go to the deepest node, which is closest to finishing a path
+    frontier = PriorityFrontier()
+    costs = {source: 0}
+    estimates = {source: 1 if source in co_stars else estimate(source)}
+    frontier.add(Node(source, None, None), (estimates[source], 0))
     explored = set()
 
+    # Maps each movie to the cost its stars were last offered at, since
+    # they only need offering again if reached more cheaply
+    scanned = {}
+
     while not frontier.empty():
         node = frontier.remove()
-        if node.state == target:
-            # Build path
-            path = []
-            while node.parent is not None:
-                path.append((node.action, node.state))
-                node = node.parent
-            return path[::-1]
-        
+        if node.state in explored:
+            continue
+        if costs[node.state] + estimates[node.state] >= best_cost:
+            break
         explored.add(node.state)
-        for movie_id, person_id in neighbors_for_person(node.state):
-            if not frontier.contains_state(person_id) and person_id not in explored:
-                child = Node(person_id, node, movie_id)
-                frontier.add(child)
 
+        cost = costs[node.state] + 1
+        shared = target_movies.intersection(movies_of(node.state))
+        if shared:
+            best = (Node(target, node, shared.pop()), Node(target, None, None))
+            best_cost = cost
+            continue
+
+        for movie in movies_of(node.state):
+            if cost + 1 >= best_cost:
+                break
+            if scanned.get(movie, cost + 1) <= cost:
+                continue
+            scanned[movie] = cost
+            for person in stars_of(movie):
+                if person in explored or costs.get(person, cost + 1) <= cost:
+                    continue
+                if person in co_stars:
+                    link = target_movies.intersection(movies_of(person)).pop()
+                    best = (Node(person, node, movie), Node(person, Node(target, None, None), link))
+                    best_cost = cost + 1
+                    break
+                if cost + 2 >= best_cost:
+                    continue
+                if person not in estimates:
+                    estimates[person] = estimate(person)
+                if cost + estimates[person] >= best_cost:
+                    continue
+                costs[person] = cost
+                frontier.add(Node(person, node, movie), (cost + estimates[person], -cost))
+
+    return None if best is None else join_paths(*best)
+
+
+def shortest_path(source, target):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target.
+
+    Searches from both ends at once, always expanding a whole level of
+    the smaller frontier, and stops as soon as the two searches meet.
+
+    If no possible path, returns None.
+    """
+    return search(source, target)[0]
+
+
+def search(source, target):
+    """
+    Returns a (path, expanded) pair, where path is as returned by
+    shortest_path and expanded is the number of people expanded
+    to find it.
+    """
+    if source == target:
+        return [], 0
+    if not connected(source, target):
+        return None, 0
+    source = people[source]
+    target = people[target]
+
+    # Answer from a cached BFS tree rooted at either end if there is one
+    if source in trees:
+        trees.move_to_end(source)
+        return walk_tree(trees[source], source, target), 0
+    if target in trees:
+        trees.move_to_end(target)
+        return walk_tree_reversed(trees[target], target, source), 0
+
+    # Each side maps an explored or frontier state to its node,
+    # and remembers which movies it has already scanned
+    forward = {source: Node(source, None, None)}
+    backward = {target: Node(target, None, None)}
+    forward_movies = set()
+    backward_movies = set()
+    forward_frontier = QueueFrontier()
+    forward_frontier.add(forward[source])
+    backward_frontier = QueueFrontier()
+    backward_frontier.add(backward[target])
+
+    path = None
+    while not forward_frontier.empty() and not backward_frontier.empty():
+        if len(forward_frontier.frontier) <= len(backward_frontier.frontier):
+            meeting = expand_level(forward_frontier, forward, forward_movies, backward)
+        else:
+            meeting = expand_level(backward_frontier, backward, backward_movies, forward)
+        if meeting is not None:
+            path = join_paths(forward[meeting], backward[meeting])
+            break
+
+    return path, forward_frontier.pops + backward_frontier.pops
+
+
+def expand_level(frontier, visited, scanned, other):
+    """
+    Expands every node currently in `frontier` by one step
+    of the integer graph.
+
+    A movie only needs scanning once per search, since all of
+    its stars are reached the first time it is scanned.
+
+    Returns a state reached by both searches, or None if the
+    searches have not met yet.
+    """
+    for _ in range(len(frontier.frontier)):
+        node = frontier.remove()
+        for movie in movies_of(node.state):
+            if movie in scanned:
+                continue
+            scanned.add(movie)
+            for person in stars_of(movie):
+                if person in visited:
+                    continue
+                child = Node(person, node, movie)
+                visited[person] = child
+                if person in other:
+                    return person
+                frontier.add(child)
     return None
 
 
+def join_paths(forward_node, backward_node):
+    """
+    Returns the (movie_id, person_id) path through the state where
+    a forward and a backward search node meet.
+    """
+    path = []
+    node = forward_node
+    while node.parent is not None:
+        path.append((node.action, node.state))
+        node = node.parent
+    path.reverse()
+
+    # Backward nodes point towards the target, so the movie
+    # on each node links it to its parent
+    node = backward_node
+    while node.parent is not None:
+        path.append((node.action, node.parent.state))
+        node = node.parent
+
+    person_ids = graph["person_ids"]
+    movie_ids = graph["movie_ids"]
+    return [(movie_ids[movie], person_ids[person]) for movie, person in path]
+
+
+def path_from_tree(source, target):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, using a BFS tree
+    of everyone reachable from the source.
+
+    The tree is built on first use and cached, so later queries
+    from the same source only walk the tree.
+
+    If no possible path, returns None.
+    """
+    source = people[source]
+    target = people[target]
+    return walk_tree(bfs_tree(source), source, target)
+
+
+def bfs_tree(source):
+    """
+    Returns the BFS tree rooted at person index `source` as a pair of
+    arrays holding each person's parent index and the movie index
+    linking them, or -1 for people that cannot be reached.
+
+    Keeps at most TREE_CACHE_SIZE trees, evicting the least recently used.
+    """
+    if source in trees:
+        trees.move_to_end(source)
+        return trees[source]
+
+    parents, parent_movies = sweep(source)[1:]
+    trees[source] = (parents, parent_movies)
+    if len(trees) > TREE_CACHE_SIZE:
+        trees.popitem(last=False)
+    return trees[source]
+
+
+def walk_tree(tree, source, target):
+    """
+    Returns the (movie_id, person_id) path from the root `source`
+    of `tree` down to `target`, or None if `target` is unreachable.
+    """
+    parents, parent_movies = tree
+    # People added after the tree was built have no movies yet
+    if target >= len(parents) or parents[target] == -1:
+        return None
+    path = []
+    person = target
+    while person != source:
+        path.append((graph["movie_ids"][parent_movies[person]], graph["person_ids"][person]))
+        person = parents[person]
+    return path[::-1]
+
+
+def walk_tree_reversed(tree, target, source):
+    """
+    Returns the (movie_id, person_id) path from `source` up to the
+    root `target` of `tree`, or None if `source` is unreachable.
+    """
+    parents, parent_movies = tree
+    if source >= len(parents) or parents[source] == -1:
+        return None
+    path = []
+    person = source
+    while person != target:
+        path.append((graph["movie_ids"][parent_movies[person]], graph["person_ids"][parents[person]]))
+        person = parents[person]
+    return path
+
+
 def person_id_for_name(name):
     """
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
     """
-    person_ids = list(names.get(name.lower(), set()))
+    person_ids = people_named(name)
     if len(person_ids) == 0:
         return None
     elif len(person_ids) > 1:
         print(f"Which '{name}'?")
         for person_id in person_ids:
-            person = people[person_id]
-            name = person["name"]
-            birth = person["birth"]
+            name = person_info(person_id, "name")
+            birth = person_info(person_id, "birth")
             print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
         try:
             person_id = input("Intended Person ID: ")
@@ -145,11 +1325,11 @@ def neighbors_for_person(person_id):
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
-    movie_ids = people[person_id]["movies"]
     neighbors = set()
-    for movie_id in movie_ids:
-        for person_id in movies[movie_id]["stars"]:
-            neighbors.add((movie_id, person_id))
+    for movie in movies_of(people[person_id]):
+        movie_id = graph["movie_ids"][movie]
+        for person in stars_of(movie):
+            neighbors.add((movie_id, graph["person_ids"][person]))
     return neighbors
 
 
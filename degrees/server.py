@@ -0,0 +1,144 @@
+import asyncio
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import degrees
+
+HOST = "127.0.0.1"
+PORT = 8765
+
+# Number of threads running searches, so one slow query
+# does not hold up the event loop or other clients
+WORKERS = 4
+
+
+def main():
+    if len(sys.argv) > 3:
+        sys.exit("Usage: python server.py [directory] [port]")
+    directory = sys.argv[1] if len(sys.argv) >= 2 else "large"
+    port = int(sys.argv[2]) if len(sys.argv) == 3 else PORT
+
+    # Load data from files into memory once for every query
+    print("Loading data...")
+    degrees.load_data(directory)
+    print("Data loaded.")
+
+    asyncio.run(serve(HOST, port))
+
+
+async def serve(host, port):
+    """
+    Accept connections on `host` and `port` until cancelled.
+
+    Each line a client sends is a JSON request, answered
+    by one line of JSON in the order received.
+    """
+    executor = ThreadPoolExecutor(WORKERS)
+
+    async def client(reader, writer):
+        try:
+            async for line in reader:
+                if not line.strip():
+                    continue
+                response = await respond(line, executor)
+                writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(client, host, port)
+    print(f"Serving on {host}:{port}")
+    with executor:
+        async with server:
+            await server.serve_forever()
+
+
+async def respond(line, executor):
+    """
+    Answer one JSON request line in the worker pool, adding the
+    time taken in milliseconds to the response.
+    """
+    start = time.perf_counter()
+    try:
+        request = json.loads(line)
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(executor, answer, request)
+    except (ValueError, KeyError, TypeError) as e:
+        response = {"error": f"bad request: {e}"}
+    except Exception as e:
+        # Any other failure answers this request without closing the connection
+        response = {"error": f"internal error: {e}"}
+    response["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    return response
+
+
+def answer(request):
+    """
+    Answer a request of the form {"op": "person", "name": ...}
+    with every matching person, {"op": "search", "query": ...,
+    "limit": ...} with the best partial matches for a name, or
+    {"op": "path", "source": ..., "target": ...} with the shortest
+    path between two person_ids.
+    """
+    if not isinstance(request, dict):
+        raise TypeError("request must be an object")
+    op = field(request, "op", str)
+
+    if op == "person":
+        person_ids = degrees.people_named(field(request, "name", str))
+        return {"people": [
+            {"id": person_id, **describe(person_id)} for person_id in person_ids
+        ]}
+
+    if op == "search":
+        limit = field(request, "limit", int, 10)
+        person_ids = degrees.search_names(field(request, "query", str), limit)
+        return {"people": [
+            {"id": person_id, **describe(person_id)} for person_id in person_ids
+        ]}
+
+    if op == "path":
+        source, target = field(request, "source", str), field(request, "target", str)
+        for person_id in (source, target):
+            if person_id not in degrees.people:
+                return {"error": f"unknown person: {person_id}"}
+        path, expanded = degrees.search(source, target)
+        return {
+            "degrees": None if path is None else len(path),
+            "path": path,
+            "expanded": expanded,
+        }
+
+    return {"error": f"unknown op: {op}"}
+
+
+def field(request, key, kind, default=None):
+    """
+    Returns the value of `key` in a request, raising KeyError if it
+    is missing without a default, or TypeError if it is not a `kind`.
+    """
+    if key not in request:
+        if default is None:
+            raise KeyError(key)
+        return default
+    value = request[key]
+    # bool is a subclass of int but never a valid count
+    if not isinstance(value, kind) or isinstance(value, bool):
+        raise TypeError(f"{key} must be {kind.__name__}")
+    return value
+
+
+def describe(person_id):
+    """
+    Returns the name and birth year of a person_id.
+    """
+    return {
+        "name": degrees.person_info(person_id, "name"),
+        "birth": degrees.person_info(person_id, "birth"),
+    }
+
+
+if __name__ == "__main__":
+    main()
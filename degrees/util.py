@@ -1,3 +1,8 @@
+import heapq
+from collections import deque
+from itertools import count
+
+
 class Node():
     def __init__(self, state, parent, action):
         self.state = state
@@ -6,14 +11,29 @@ class Node():
 
 
 class StackFrontier():
+    """
+    Last-in first-out frontier.
+
+    Keeps a count of the states it holds so `contains_state` is O(1),
+    and counts pushes, pops and the peak size for profiling.
+    """
+
     def __init__(self):
         self.frontier = []
+        self.states = {}
+        self.pushes = 0
+        self.pops = 0
+        self.peak = 0
+
+    def __len__(self):
+        return len(self.frontier)
 
     def add(self, node):
         self.frontier.append(node)
+        self.added(node)
 
     def contains_state(self, state):
-        return any(node.state == state for node in self.frontier)
+        return state in self.states
 
     def empty(self):
         return len(self.frontier) == 0
@@ -22,17 +42,63 @@ class StackFrontier():
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[-1]
-            self.frontier = self.frontier[:-1]
+            node = self.frontier.pop()
+            self.removed(node)
             return node
 
+    def added(self, node):
+        self.states[node.state] = self.states.get(node.state, 0) + 1
+        self.pushes += 1
+        if len(self.frontier) > self.peak:
+            self.peak = len(self.frontier)
+
+    def removed(self, node):
+        if self.states[node.state] == 1:
+            del self.states[node.state]
+        else:
+            self.states[node.state] -= 1
+        self.pops += 1
+
+    def stats(self):
+        return {"pushes": self.pushes, "pops": self.pops, "peak": self.peak}
+
 
 class QueueFrontier(StackFrontier):
+    """
+    First-in first-out frontier backed by a deque.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.frontier = deque()
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        else:
+            node = self.frontier.popleft()
+            self.removed(node)
+            return node
+
+
+class PriorityFrontier(StackFrontier):
+    """
+    Frontier that removes the node with the lowest priority first,
+    breaking ties in insertion order.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.order = count()
+
+    def add(self, node, priority=0):
+        heapq.heappush(self.frontier, (priority, next(self.order), node))
+        self.added(node)
 
     def remove(self):
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[0]
-            self.frontier = self.frontier[1:]
+            node = heapq.heappop(self.frontier)[2]
+            self.removed(node)
             return node
@@ -1,18 +1,57 @@
+import csv
+import heapq
+import json
+import mmap
 import os
 import random
 import re
 import sys
+import tempfile
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 
 DAMPING = 0.85
 SAMPLES = 10000
 
+# Sample counts from which sampling is split across processes
+PARALLEL_SAMPLES = 1000000
+
+# Standard normal quantile for the 95% confidence intervals of adaptive sampling
+CONFIDENCE_Z = 1.96
+
+# Iterations between extrapolation steps of the "quadratic" solver
+EXTRAPOLATION_INTERVAL = 3
+
+# Number of links sorted in memory at once when writing an edge file
+RUN_LINKS = 1 << 22
+
+# Uncached pages from which a crawl parses pages in a pool of processes
+PARALLEL_PAGES = 1000
+
+# Bytes of HTML read at a time when extracting links
+CHUNK_SIZE = 1 << 16
+
+# Pattern matching a link to another page
+LINK_PATTERN = re.compile(rb"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+# Pattern matching the start of a link cut off by the end of the text
+PARTIAL_LINK_PATTERN = re.compile(rb"<(?:a(?:\s+[^>]*)?|a\s+[^>]*?href=\"[^\"]*)?\Z")
+
+# File in a corpus directory remembering the links of each page
+LINK_CACHE = ".pagerank-cache.json"
+
 
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
+    if len(sys.argv) not in (2, 3):
+        sys.exit("Usage: python pagerank.py corpus [samples]")
     corpus = crawl(sys.argv[1])
-    ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
-    print(f"PageRank Results from Sampling (n = {SAMPLES})")
+    samples = int(sys.argv[2]) if len(sys.argv) == 3 else SAMPLES
+    if samples >= PARALLEL_SAMPLES:
+        ranks = parallel_sample_pagerank(corpus, DAMPING, samples)
+    else:
+        ranks = sample_pagerank(corpus, DAMPING, samples)
+    print(f"PageRank Results from Sampling (n = {samples})")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
     ranks = iterate_pagerank(corpus, DAMPING)
@@ -26,28 +65,234 @@ def crawl(directory):
     Parse a directory of HTML pages and check for links to other pages.
     Return a dictionary where each key is a page, and values are
     a list of all other pages in the corpus that are linked to by the page.
+
+    The links of each page are cached in the directory so that only
+    pages modified since the last crawl are parsed again.
     """
     pages = dict()
+    cache = load_link_cache(directory)
+    entries = [entry for entry in os.scandir(directory) if entry.name.endswith(".html")]
+
+    # Each cache entry is the page's modification time and size, then its links
+    stale = []
+    for entry in entries:
+        stat = entry.stat()
+        cached = cache.get(entry.name)
+        if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            pages[entry.name] = set(cached[2:])
+        else:
+            # Filled in below, keeping pages in directory order
+            pages[entry.name] = None
+            stale.append((entry, stat))
 
-    # Extract all links from HTML files
-    for filename in os.listdir(directory):
-        if not filename.endswith(".html"):
-            continue
-        with open(os.path.join(directory, filename)) as f:
-            contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
-            pages[filename] = set(links) - {filename}
+    # Extract all links from the other HTML files
+    for (entry, stat), links in zip(stale, parse_pages([entry.path for entry, _ in stale])):
+        pages[entry.name] = links
+        cache[entry.name] = [stat.st_mtime_ns, stat.st_size, *links]
+
+    if stale or len(cache) != len(pages):
+        save_link_cache(directory, {page: cache[page] for page in pages})
 
     # Only include links to other pages in the corpus
+    corpus = set(pages)
     for filename in pages:
-        pages[filename] = set(
-            link for link in pages[filename]
-            if link in pages
-        )
+        pages[filename] = (pages[filename] & corpus) - {filename}
 
     return pages
 
 
+def parse_pages(paths):
+    """
+    Return the links of each HTML page in `paths`, in order.
+
+    Many pages are parsed in a pool of processes, one per CPU.
+    """
+    workers = os.cpu_count() or 1
+    if len(paths) < PARALLEL_PAGES or workers == 1:
+        return [page_links(path) for path in paths]
+    with ProcessPoolExecutor(workers) as executor:
+        return list(executor.map(page_links, paths, chunksize=len(paths) // (workers * 4) + 1))
+
+
+def load_link_cache(directory):
+    """
+    Return the cached links of the pages in `directory`, or an
+    empty dictionary if there is no readable cache.
+    """
+    try:
+        with open(os.path.join(directory, LINK_CACHE)) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or not all(isinstance(entry, list) for entry in cache.values()):
+        return {}
+    return cache
+
+
+def save_link_cache(directory, cache):
+    """
+    Write the links of the pages in `directory` to its cache,
+    skipping the cache if the directory is not writable.
+    """
+    path = os.path.join(directory, LINK_CACHE)
+    try:
+        with open(f"{path}.tmp", "w") as f:
+            # Encoding to a string first uses the faster C encoder
+            f.write(json.dumps(cache))
+        os.replace(f"{path}.tmp", path)
+    except OSError:
+        pass
+
+
+def page_links(path):
+    """
+    Return the set of pages linked to by the HTML page at `path`,
+    reading it in chunks of CHUNK_SIZE bytes.
+
+    Only the links themselves are decoded, as UTF-8.
+    """
+    links = set()
+    with open(path, "rb") as f:
+        buffer = f.read(CHUNK_SIZE)
+        while chunk := f.read(CHUNK_SIZE):
+            end = 0
+            for match in LINK_PATTERN.finditer(buffer):
+                links.add(match.group(1))
+                end = match.end()
+            # Carry over a link the chunk may have cut short
+            partial = PARTIAL_LINK_PATTERN.search(buffer, end)
+            buffer = (buffer[partial.start():] if partial else b"") + chunk
+    links.update(LINK_PATTERN.findall(buffer))
+    return {link.decode("utf-8") for link in links}
+
+
+def crawl_to_file(directory, filename):
+    """
+    Parse a directory of HTML pages like `crawl`, but write the links
+    to disk instead of holding them in memory.
+
+    `filename` receives every link as a pair of 32-bit page indexes
+    (destination, source), sorted by destination, and `filename`.pages
+    receives one line per page with its name and number of links.
+    Links are sorted in runs of RUN_LINKS that are then merged, so
+    memory use does not grow with the number of links.
+    """
+    pages = sorted(name for name in os.listdir(directory) if name.endswith(".html"))
+    index = {page: i for i, page in enumerate(pages)}
+    out_degrees = array("I", [0]) * len(pages)
+
+    with tempfile.TemporaryDirectory() as scratch:
+        runs = []
+        run = array("Q")
+        for source, page in enumerate(pages):
+            for link in page_links(os.path.join(directory, page)):
+                if link in index and link != page:
+                    run.append(index[link] << 32 | source)
+                    out_degrees[source] += 1
+            if len(run) >= RUN_LINKS or source == len(pages) - 1:
+                runs.append(write_run(scratch, len(runs), run))
+                run = array("Q")
+
+        with open(filename, "wb") as f:
+            buffer = array("I")
+            for key in heapq.merge(*(read_run(path) for path in runs)):
+                buffer.append(key >> 32)
+                buffer.append(key & 0xFFFFFFFF)
+                if len(buffer) >= RUN_LINKS:
+                    buffer.tofile(f)
+                    buffer = array("I")
+            buffer.tofile(f)
+
+    with open(f"{filename}.pages", "w") as f:
+        for page, degree in zip(pages, out_degrees):
+            f.write(f"{page}\t{degree}\n")
+
+
+def write_run(directory, number, run):
+    """
+    Sort an array of links and write it to a file in `directory`,
+    returning the path of the file.
+    """
+    path = os.path.join(directory, f"run{number}")
+    with open(path, "wb") as f:
+        array("Q", sorted(run)).tofile(f)
+    return path
+
+
+def read_run(path):
+    """
+    Yield the links in a file written by `write_run`.
+    """
+    with open(path, "rb") as f:
+        while True:
+            chunk = array("Q")
+            try:
+                chunk.fromfile(f, RUN_LINKS)
+            except EOFError:
+                yield from chunk
+                return
+            yield from chunk
+
+
+def iterate_pagerank_file(filename, damping_factor, tolerance=0.001):
+    """
+    Return PageRank values for each page of an edge file written by
+    `crawl_to_file`, iterating until no value changes by `tolerance`.
+
+    The edge file is memory-mapped and streamed once per iteration,
+    so only the rank values and link counts are held in memory.
+    """
+    pages = []
+    out_degrees = array("I")
+    with open(f"{filename}.pages") as f:
+        for line in f:
+            page, degree = line.rstrip("\n").split("\t")
+            pages.append(page)
+            out_degrees.append(int(degree))
+    N = len(pages)
+
+    page_rank = array("d", [1 / N]) * N
+    with open(filename, "rb") as f:
+        if os.path.getsize(filename) == 0:
+            links = memoryview(b"").cast("I")
+        else:
+            links = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)).cast("I")
+        destinations, sources = links[0::2], links[1::2]
+
+        while True:
+            shares = array("d", (
+                rank / degree if degree else 0
+                for rank, degree in zip(page_rank, out_degrees)
+            ))
+
+            # Pages with no links spread their rank evenly over every page
+            dangling = sum([rank for rank, degree in zip(page_rank, out_degrees) if degree == 0])
+            base = (1 - damping_factor) / N + damping_factor * dangling / N
+
+            # Links are sorted by destination, so each page's inbound
+            # shares form one run and its value is emitted in page order
+            previous_page_rank = page_rank
+            page_rank = array("d")
+            destination, total = 0, 0
+            for link, source in zip(destinations, sources):
+                if link != destination:
+                    page_rank.append(base + damping_factor * total)
+                    # Pages with no inbound links only get the base value
+                    page_rank.extend([base] * (link - destination - 1))
+                    destination, total = link, 0
+                total += shares[source]
+            page_rank.append(base + damping_factor * total)
+            page_rank.extend([base] * (N - destination - 1))
+
+            if all(abs(new - old) < tolerance for new, old in zip(page_rank, previous_page_rank)):
+                break
+        destinations.release()
+        sources.release()
+        links.release()
+
+    return PageRanks(zip(pages, page_rank))
+
+
 def transition_model(corpus, page, damping_factor):
     """
     Return a probability distribution over which page to visit next,
@@ -86,32 +331,130 @@ def sample_pagerank(corpus, damping_factor, n):
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-    # Choose the first page at random
-    current_page = random.choice(list(corpus.keys()))
+    pages, links = sampling_links(corpus)
+    counts = walk(links, damping_factor, n, random)
 
-    # Initialize the probabilities
-    probabilities = transition_model(corpus, current_page, damping_factor)
+    # Return the page rank values
+    return PageRanks((page, count / n) for page, count in zip(pages, counts))
 
-    # Keep track of the distribution of pages
-    distribution = {}
-    for page in corpus:
-        distribution[page] = 0
 
-    # Update the distribution of pages
-    distribution[current_page] += 1
+def parallel_sample_pagerank(corpus, damping_factor, n, walkers=None, seed=None):
+    """
+    Return PageRank values for each page by sampling `n` pages in total
+    across `walkers` independent random walks run in separate processes,
+    one per CPU by default.
+
+    Walker i draws from a generator seeded with `seed` and i, so the
+    result only depends on `seed`, `walkers` and the corpus.
+    """
+    if walkers is None:
+        walkers = os.cpu_count() or 1
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+
+    pages, links = sampling_links(corpus)
+    steps = [n // walkers + (i < n % walkers) for i in range(walkers)]
+    with ProcessPoolExecutor(walkers) as executor:
+        results = executor.map(
+            seeded_walk,
+            [links] * walkers, [damping_factor] * walkers, steps,
+            [f"{seed}:{i}" for i in range(walkers)]
+        )
+        counts = [sum(visits) for visits in zip(*results)]
+
+    return PageRanks((page, count / n) for page, count in zip(pages, counts))
+
+
+def adaptive_sample_pagerank(corpus, damping_factor, tolerance=0.005,
+                             batch_size=1000, min_batches=10, max_samples=None):
+    """
+    Return PageRank values for each page by sampling in batches of
+    `batch_size` pages until every value is known to within `tolerance`.
+
+    Each batch gives one estimate of every value. Their mean is the
+    result, and their spread gives a 95% confidence interval for it.
+    Sampling stops once every interval's half-width is at most
+    `tolerance`, after at least `min_batches` batches, or once
+    `max_samples` pages have been sampled. At least two batches are
+    needed to measure the spread, so `min_batches` below 2 counts as 2.
+
+    Return a tuple (ranks, samples) of the PageRank values and the
+    number of pages sampled.
+    """
+    pages, links = sampling_links(corpus)
+    totals = [0] * len(pages)
+    squares = [0] * len(pages)
+    batches = 0
+    min_batches = max(min_batches, 2)
+
+    while True:
+        counts = walk(links, damping_factor, batch_size, random)
+        batches += 1
+        for i, count in enumerate(counts):
+            estimate = count / batch_size
+            totals[i] += estimate
+            squares[i] += estimate * estimate
+
+        if max_samples is not None and batches * batch_size >= max_samples:
+            break
+        if batches >= min_batches:
+            # Half-width of the interval around the mean of the batch estimates
+            widest = max(
+                CONFIDENCE_Z * (max(square - total * total / batches, 0) / (batches - 1) / batches) ** 0.5
+                for total, square in zip(totals, squares)
+            )
+            if widest <= tolerance:
+                break
+
+    ranks = PageRanks((page, total / batches) for page, total in zip(pages, totals))
+    return ranks, batches * batch_size
+
+
+def sampling_links(corpus):
+    """
+    Return a list of pages and, for each page, a tuple of
+    the indexes of the pages it links to.
+    """
+    pages = list(corpus)
+    index = {page: i for i, page in enumerate(pages)}
+    return pages, [tuple(index[link] for link in corpus[page]) for page in pages]
+
+
+def walk(links, damping_factor, n, generator):
+    """
+    Return how many times each page is visited by a random walk of
+    `n` pages over `links`, starting with a page at random and drawing
+    random numbers from `generator`.
+
+    Following the transition model is the same as following a random
+    link with probability `damping_factor` and jumping to a random page
+    otherwise, which takes constant time per sample.
+    """
+    counts = [0] * len(links)
+    if n == 0:
+        return counts
+    current = generator.randrange(len(links))
+    counts[current] += 1
 
-    # For each of the remaining samples, the next sample should be generated from the previous sample based on the previous sample's transition model.
     for _ in range(n - 1):
-        probabilities = transition_model(corpus, current_page, damping_factor)
-        current_page = random.choices(list(probabilities.keys()), weights=list(probabilities.values()), k=1)[0]
-        distribution[current_page] += 1
+        outgoing = links[current]
+        if outgoing and generator.random() < damping_factor:
+            current = generator.choice(outgoing)
+        else:
+            current = generator.randrange(len(links))
+        counts[current] += 1
 
-    # Return the page rank values
-    return {page: count / n for page, count in distribution.items()}
-    
+    return counts
 
 
-def iterate_pagerank(corpus, damping_factor):
+def seeded_walk(links, damping_factor, n, seed):
+    """
+    Run `walk` with its own generator seeded with `seed`.
+    """
+    return walk(links, damping_factor, n, random.Random(seed))
+
+
+def iterate_pagerank(corpus, damping_factor, **options):
     """
     Return PageRank values for each page by iteratively updating
     PageRank values until convergence.
@@ -119,41 +462,327 @@ def iterate_pagerank(corpus, damping_factor):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
+
+    Keyword `options` choose the solver and stopping rule, as for `converge`.
     """
+    matrix = link_matrix(corpus)
     N = len(corpus)
-    
+
     # Initialize the page rank values
-    page_rank = {}
-    for page in corpus:
-        page_rank[page] = 1 / N
-    
-    # For pages with no links, treat them as having links to all pages
-    for page in corpus:
-        if len(corpus[page]) == 0:
-            corpus[page] = set(corpus.keys())
+    page_rank = [1 / N] * N
 
-    # Iterate until convergence (values don't change by more than 0.001)
-    while True:
-        # Keep track of the previous page rank values
-        previous_page_rank = page_rank.copy()
-
-        # Update the page rank values for each page
-        for page in corpus:
-            total = 0
-            # Find all pages that link to this page
-            for linking_page in corpus:
-                if page in corpus[linking_page]:
-                    total += previous_page_rank[linking_page] / len(corpus[linking_page])
-            
-            # Apply PageRank formula
-            page_rank[page] = (1 - damping_factor) / N + damping_factor * total
+    return PageRanks(zip(matrix[0], converge(matrix, damping_factor, page_rank, **options)))
+
+
+def update_pagerank(corpus, damping_factor, previous, **options):
+    """
+    Return PageRank values for each page of a changed corpus,
+    iterating from the `previous` PageRank values of an earlier
+    version of it instead of from a uniform distribution.
+
+    Pages that are new to the corpus start with an even share, and
+    the starting values are rescaled to sum to 1. When only a small
+    part of the corpus has changed, the starting values are already
+    close to the result and few iterations are needed.
+
+    Keyword `options` choose the solver and stopping rule, as for `converge`.
+    """
+    matrix = link_matrix(corpus)
+    N = len(corpus)
+
+    page_rank = [previous.get(page, 1 / N) for page in matrix[0]]
+    total = sum(page_rank)
+    if total > 0:
+        page_rank = [rank / total for rank in page_rank]
+    else:
+        page_rank = [1 / N] * N
+
+    return PageRanks(zip(matrix[0], converge(matrix, damping_factor, page_rank, **options)))
+
+
+def converge(matrix, damping_factor, page_rank, solver="jacobi", tolerance=0.001,
+             norm="max", max_iterations=None, callback=None):
+    """
+    Return a list of PageRank values for the pages of a `link_matrix`,
+    updating the list `page_rank` until convergence.
+
+    `solver` is "jacobi" to compute each iteration from the previous
+    one, "gauss-seidel" to use values from the current iteration as
+    soon as they are updated, or "quadratic" for Jacobi iterations with
+    periodic quadratic extrapolation. Extrapolation pays off when a few
+    slowly mixing parts of the corpus, such as clusters of pages linking
+    mostly to each other, hold back convergence; an extrapolation that
+    makes the next change larger is undone.
+
+    Stops once the `norm` ("max" or "l1") of the change in values is
+    below `tolerance`, or after `max_iterations` iterations. If given,
+    `callback` is called after each iteration with the iteration number,
+    that change and the seconds elapsed so far.
+    """
+    if solver not in ("jacobi", "gauss-seidel", "quadratic"):
+        raise ValueError(f"unknown solver: {solver}")
+    if norm not in ("max", "l1"):
+        raise ValueError(f"unknown norm: {norm}")
+
+    start = time.perf_counter()
+    history = []
+    fallback = None
+    iteration = 0
+    while max_iterations is None or iteration < max_iterations:
+        iteration += 1
+        previous_page_rank = page_rank
+        if solver == "gauss-seidel":
+            page_rank = gauss_seidel_step(matrix, damping_factor, page_rank)
+        else:
+            page_rank = jacobi_step(matrix, damping_factor, page_rank)
+
+        differences = [abs(new - old) for new, old in zip(page_rank, previous_page_rank)]
+        change = max(differences) if norm == "max" else sum(differences)
+        if callback is not None:
+            callback(iteration, change, time.perf_counter() - start)
 
         # Check if the values have converged
-        if all(abs(page_rank[page] - previous_page_rank[page]) < 0.001 for page in corpus):
+        if change < tolerance:
             break
 
+        if solver == "quadratic":
+            if fallback is not None and change > fallback[1]:
+                # The last extrapolation made the next change larger,
+                # so continue from the values it replaced
+                page_rank = fallback[0]
+                history = []
+            else:
+                history = history[-2:] + [previous_page_rank]
+            fallback = None
+            if iteration % EXTRAPOLATION_INTERVAL == 0 and len(history) == 3:
+                fallback = (page_rank, change)
+                page_rank = extrapolate(history + [page_rank])
+
     return page_rank
 
 
+def jacobi_step(matrix, damping_factor, page_rank):
+    """
+    Return the PageRank values after one update of every page
+    from the values in `page_rank`.
+    """
+    pages, offsets, sources, out_degrees = matrix
+    N = len(pages)
+
+    # Share of each page's rank passed along each of its links
+    shares = [rank / degree if degree else 0 for rank, degree in zip(page_rank, out_degrees)]
+
+    # Pages with no links are treated as linking to all pages,
+    # which spreads their combined rank evenly over every page
+    dangling = sum([rank for rank, degree in zip(page_rank, out_degrees) if degree == 0])
+    base = (1 - damping_factor) / N + damping_factor * dangling / N
+
+    # Apply PageRank formula, summing the shares of each page's inbound links
+    return [
+        base + damping_factor * sum([shares[source] for source in sources[offsets[i]:offsets[i + 1]]])
+        for i in range(N)
+    ]
+
+
+def gauss_seidel_step(matrix, damping_factor, page_rank):
+    """
+    Return the PageRank values after updating every page in turn,
+    using the values of pages already updated in this step.
+
+    The values are rescaled to sum to 1 afterwards, since an in-place
+    sweep does not preserve the total and its error decays slowly.
+    """
+    pages, offsets, sources, out_degrees = matrix
+    N = len(pages)
+    page_rank = list(page_rank)
+    dangling = sum([rank for rank, degree in zip(page_rank, out_degrees) if degree == 0])
+
+    for i in range(N):
+        total = sum([page_rank[source] / out_degrees[source] for source in sources[offsets[i]:offsets[i + 1]]])
+        rank = (1 - damping_factor) / N + damping_factor * (dangling / N + total)
+        if out_degrees[i] == 0:
+            dangling += rank - page_rank[i]
+        page_rank[i] = rank
+
+    total = sum(page_rank)
+    return [rank / total for rank in page_rank]
+
+
+def extrapolate(iterates):
+    """
+    Return the quadratic extrapolation of four successive lists of
+    PageRank values, rescaled to sum to 1.
+
+    Assumes the error of the oldest values lies mostly along the two
+    slowest-decaying directions of the iteration, and fits the
+    combination of the iterates that cancels it by least squares.
+    """
+    x0, x1, x2, x3 = iterates
+    y1 = [b - a for a, b in zip(x0, x1)]
+    y2 = [b - a for a, b in zip(x0, x2)]
+    y3 = [b - a for a, b in zip(x0, x3)]
+
+    # Solve the normal equations of y1 * g1 + y2 * g2 = -y3
+    a11 = sum([u * u for u in y1])
+    a12 = sum([u * v for u, v in zip(y1, y2)])
+    a22 = sum([v * v for v in y2])
+    b1 = -sum([u * w for u, w in zip(y1, y3)])
+    b2 = -sum([v * w for v, w in zip(y2, y3)])
+    determinant = a11 * a22 - a12 * a12
+    if determinant <= 1e-12 * a11 * a22:
+        return x3
+    g1 = (b1 * a22 - b2 * a12) / determinant
+    g2 = (a11 * b2 - a12 * b1) / determinant
+
+    beta0, beta1, beta2 = g1 + g2 + 1, g2 + 1, 1
+    extrapolated = [
+        max(beta0 * a + beta1 * b + beta2 * c, 0)
+        for a, b, c in zip(x1, x2, x3)
+    ]
+    total = sum(extrapolated)
+    if total == 0:
+        return x3
+    return [value / total for value in extrapolated]
+
+
+def personalized_pagerank(corpus, damping_factor, teleports, tolerance=0.001):
+    """
+    Return a list of PageRank values for each teleport distribution in
+    `teleports`, where random jumps land on each page in proportion to
+    its weight in the distribution instead of uniformly.
+
+    `damping_factor` is either one value for every distribution or a
+    list with one value per distribution. All rankings are iterated
+    together, so each pass over the links serves every distribution.
+    """
+    pages, offsets, sources, out_degrees = link_matrix(corpus)
+    N = len(pages)
+    K = len(teleports)
+    if isinstance(damping_factor, (int, float)):
+        damping_factors = [damping_factor] * K
+    else:
+        damping_factors = list(damping_factor)
+
+    # Teleport probability of each page, scaled by 1 - damping factor
+    jumps = []
+    for teleport, damping in zip(teleports, damping_factors):
+        total = sum(teleport.values())
+        jumps.append([(1 - damping) * teleport.get(page, 0) / total for page in pages])
+    jumps = list(zip(*jumps))
+
+    # Rows of the rank matrix hold one page's rank in every distribution
+    page_rank = [[1 / N] * K for _ in range(N)]
+    dangling = [i for i, degree in enumerate(out_degrees) if degree == 0]
+    no_shares = [0] * K
+
+    while True:
+        shares = [
+            [rank / degree for rank in ranks] if degree else no_shares
+            for ranks, degree in zip(page_rank, out_degrees)
+        ]
+
+        # Pages with no links spread their rank evenly over every page
+        spread = [
+            damping * sum(ranks) / N
+            for damping, ranks in zip(damping_factors, zip(*(page_rank[i] for i in dangling)))
+        ] if dangling else no_shares
+
+        previous_page_rank = page_rank
+        page_rank = []
+        for i in range(N):
+            row = sources[offsets[i]:offsets[i + 1]]
+            inbound = [sum(column) for column in zip(*(shares[source] for source in row))] if row else no_shares
+            page_rank.append([
+                jump + spread_k + damping * total
+                for jump, spread_k, damping, total in zip(jumps[i], spread, damping_factors, inbound)
+            ])
+
+        if all(
+            abs(new - old) < tolerance
+            for new_ranks, old_ranks in zip(page_rank, previous_page_rank)
+            for new, old in zip(new_ranks, old_ranks)
+        ):
+            break
+
+    return [PageRanks(zip(pages, ranks)) for ranks in zip(*page_rank)]
+
+
+def link_matrix(corpus):
+    """
+    Return the links of `corpus` as a sparse matrix in compressed rows,
+    built once so each iteration only touches existing links.
+
+    Return a tuple (pages, offsets, sources, out_degrees), where pages
+    lists every page, the pages linking to pages[i] are the indexes
+    sources[offsets[i]:offsets[i + 1]], and out_degrees[i] is the
+    number of links on pages[i].
+    """
+    pages = list(corpus)
+    index = {page: i for i, page in enumerate(pages)}
+
+    inbound = [[] for _ in pages]
+    for page in pages:
+        for link in corpus[page]:
+            inbound[index[link]].append(index[page])
+
+    offsets = [0]
+    sources = []
+    for links in inbound:
+        sources.extend(links)
+        offsets.append(len(sources))
+
+    out_degrees = [len(corpus[page]) for page in pages]
+    return pages, offsets, sources, out_degrees
+
+
+class PageRanks(dict):
+    """
+    Dictionary of PageRank values by page, with queries
+    that avoid sorting every page.
+    """
+
+    def top(self, k):
+        """
+        Return the `k` pages with the highest PageRank values
+        as a list of (page, value) pairs, highest first.
+        """
+        return heapq.nlargest(k, self.items(), key=lambda item: item[1])
+
+    def rank_of(self, page):
+        """
+        Return the position of `page` when pages are ordered by
+        PageRank value, counting from 1 for the highest value.
+
+        Compares against every page, so each call is O(N); sort the
+        items once instead when ranking many pages.
+        """
+        value = self[page]
+        return 1 + sum(1 for other in self.values() if other > value)
+
+    def write_csv(self, filename):
+        """
+        Write a "page,rank" row for every page to a CSV file.
+        """
+        with open(filename, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["page", "rank"])
+            writer.writerows(self.items())
+
+    def write_binary(self, filename):
+        """
+        Write every PageRank value as a 64-bit float to `filename`,
+        and the page names in the same order, one per line,
+        to `filename`.pages.
+
+        Unlike the `filename`.pages written by `crawl_to_file`, the
+        lines hold only the page name, with no tab-separated degree.
+        """
+        with open(filename, "wb") as f:
+            array("d", self.values()).tofile(f)
+        with open(f"{filename}.pages", "w") as f:
+            for page in self:
+                f.write(f"{page}\n")
+
+
 if __name__ == "__main__":
     main()